@@ -6,7 +6,7 @@ from pathlib import Path
 from typing import Callable
 from ipaddress import ip_address
 from fastapi import FastAPI, HTTPException, Depends, Request, status
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import ORJSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -16,8 +16,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.conf.config import config
 from src.database.db import get_db
 from src.routes import contacts, users, auth
+from src.services.auth import auth_service
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 banned_ips = [ip_address("192.168.1.1"), ip_address("192.168.1.2")]
 origins = ["*"]
@@ -25,20 +26,20 @@ app.add_middleware(CORSMiddleware,
                    allow_origins=origins,
                    allow_credentials=True,
                    allow_methods=["*"],
-                   allow_headers=["*"], )
+                   allow_headers=["*"],
+                   # the contact lists return the next page cursor in this header
+                   expose_headers=["X-Next-Cursor"], )
 
 user_agent_ban_list = [r"bot-Yandex", r"Googlebot", r"Python-urllib"]
 
 
 @app.middleware("http")
 async def user_agent_ban_middleware(request: Request, call_next: Callable):
-    print(request.headers.get("Authorization"))
     user_agent = request.headers.get("user-agent")
-    print(user_agent)
     for ban_pattern in user_agent_ban_list:
         if re.search(ban_pattern, user_agent):
-            return JSONResponse(status_code=status.HTTP_403_FORBIDDEN,
-                                content={"detail": "You are banned"})
+            return ORJSONResponse(status_code=status.HTTP_403_FORBIDDEN,
+                                  content={"detail": "You are banned"})
     response = await call_next(request)
     return response
 
@@ -61,6 +62,7 @@ async def startup():
         password=config.REDIS_PASSWORD,
     )
     await FastAPILimiter.init(r)
+    auth_service.warmup()
 
 
 templates = Jinja2Templates(directory=BASE_DIR / "src" / "templates")
@@ -0,0 +1,36 @@
+"""add prefix indexes for contacts
+
+Revision ID: 0b6d2e9f4c31
+Revises: f5b39a7c2e18
+Create Date: 2026-10-14 13:41:12.587309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6d2e9f4c31'
+down_revision: Union[str, None] = 'f5b39a7c2e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PREFIX_COLUMNS = ('name', 'lastname', 'email')
+
+
+def upgrade() -> None:
+    # serves the per-column prefix LIKE used for queries shorter than one trigram
+    with op.get_context().autocommit_block():
+        for column in PREFIX_COLUMNS:
+            op.create_index(f'ix_contacts_{column}_prefix', 'contacts',
+                            [sa.text(f'lower({column}) text_pattern_ops')],
+                            unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in reversed(PREFIX_COLUMNS):
+            op.drop_index(f'ix_contacts_{column}_prefix', table_name='contacts',
+                          postgresql_concurrently=True)
@@ -0,0 +1,39 @@
+"""add trgm indexes for contacts
+
+Revision ID: a3f1c9d2e4b7
+Revises: 64c18702bcf7
+Create Date: 2026-10-14 09:12:05.418236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f1c9d2e4b7'
+down_revision: Union[str, None] = '64c18702bcf7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRGM_COLUMNS = ('name', 'lastname', 'email')
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for column in TRGM_COLUMNS:
+            op.create_index(f'ix_contacts_{column}_trgm', 'contacts', [column],
+                            unique=False,
+                            postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'},
+                            postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in reversed(TRGM_COLUMNS):
+            op.drop_index(f'ix_contacts_{column}_trgm', table_name='contacts',
+                          postgresql_concurrently=True)
@@ -0,0 +1,54 @@
+"""add search blob to contacts
+
+Revision ID: c71e0b5a9d3f
+Revises: a3f1c9d2e4b7
+Create Date: 2026-10-14 10:03:47.126590
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71e0b5a9d3f'
+down_revision: Union[str, None] = 'a3f1c9d2e4b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# searched through search_blob and lower(column) only, so these column indexes go unused
+SEARCH_COLUMNS = ('name', 'lastname', 'email')
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column(
+        'search_blob', sa.Text(),
+        sa.Computed("lower(name || ' ' || lastname || ' ' || email)",
+                    persisted=True)))
+    with op.get_context().autocommit_block():
+        op.create_index('ix_contacts_search_blob_trgm', 'contacts',
+                        ['search_blob'], unique=False,
+                        postgresql_using='gin',
+                        postgresql_ops={'search_blob': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+        for column in SEARCH_COLUMNS:
+            op.drop_index(f'ix_contacts_{column}_trgm', table_name='contacts',
+                          postgresql_concurrently=True)
+            op.drop_index(f'ix_contacts_{column}', table_name='contacts',
+                          postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in reversed(SEARCH_COLUMNS):
+            op.create_index(f'ix_contacts_{column}', 'contacts', [column],
+                            unique=False, postgresql_concurrently=True)
+            op.create_index(f'ix_contacts_{column}_trgm', 'contacts', [column],
+                            unique=False,
+                            postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'},
+                            postgresql_concurrently=True)
+        op.drop_index('ix_contacts_search_blob_trgm', table_name='contacts',
+                      postgresql_concurrently=True)
+    op.drop_column('contacts', 'search_blob')
@@ -0,0 +1,36 @@
+"""add user composite indexes to contacts
+
+Revision ID: e2d84f6b1a05
+Revises: c71e0b5a9d3f
+Create Date: 2026-10-14 11:26:31.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2d84f6b1a05'
+down_revision: Union[str, None] = 'c71e0b5a9d3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_contacts_user_id_id', 'contacts',
+                        ['user_id', 'id'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_contacts_user_id_birthdate', 'contacts',
+                        ['user_id', 'birthdate'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_contacts_user_id_birthdate', table_name='contacts',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_contacts_user_id_id', table_name='contacts',
+                      postgresql_concurrently=True)
@@ -0,0 +1,41 @@
+"""convert contacts birthdate to date
+
+Revision ID: f5b39a7c2e18
+Revises: e2d84f6b1a05
+Create Date: 2026-10-14 12:08:54.331072
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5b39a7c2e18'
+down_revision: Union[str, None] = 'e2d84f6b1a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('contacts', 'birthdate',
+                    existing_type=sa.String(),
+                    type_=sa.Date(),
+                    existing_nullable=False,
+                    postgresql_using="to_date(birthdate, 'DD.MM.YYYY')")
+    op.execute("CREATE INDEX ix_contacts_bday_mmdd ON contacts "
+               "((extract(month from birthdate)), (extract(day from birthdate)))")
+    # birthdays now filter on month and day, and ix_contacts_user_id_id already covers user_id
+    op.drop_index('ix_contacts_user_id_birthdate', table_name='contacts')
+
+
+def downgrade() -> None:
+    op.create_index('ix_contacts_user_id_birthdate', 'contacts',
+                    ['user_id', 'birthdate'], unique=False)
+    op.drop_index('ix_contacts_bday_mmdd', table_name='contacts')
+    op.alter_column('contacts', 'birthdate',
+                    existing_type=sa.Date(),
+                    type_=sa.String(),
+                    existing_nullable=False,
+                    postgresql_using="to_char(birthdate, 'DD.MM.YYYY')")
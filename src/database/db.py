@@ -10,9 +10,18 @@ class DatabaseSessionManager:
     def __init__(self, url: str):
         """ Initialize the session manager. """
 
-        self._engine: AsyncEngine | None = create_async_engine(url)
+        self._engine: AsyncEngine | None = create_async_engine(
+            url,
+            pool_size=20,
+            max_overflow=40,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+            pool_use_lifo=True,
+            query_cache_size=1200,
+            insertmanyvalues_page_size=1000,
+        )
         self._session_maker: async_sessionmaker = async_sessionmaker(
-            autoflush=False, autocommit=False,
+            autoflush=False, autocommit=False, expire_on_commit=False,
             bind=self._engine)
 
     @contextlib.asynccontextmanager
@@ -36,4 +45,4 @@ sessionmanager = DatabaseSessionManager(config.DB_URL)
 async def get_db():
     """ Get the database session. """
     async with sessionmanager.session() as session:
-        return session
+        yield session
@@ -14,9 +14,9 @@
 # class Contact(Base):
 #     __tablename__ = "contacts"
 #     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-#     name: Mapped[str] = mapped_column(String(50), index=True)
-#     lastname: Mapped[str] = mapped_column(String(50), index=True)
-#     email: Mapped[str] = mapped_column(String(50), index=True)
+#     name: Mapped[str] = mapped_column(String(50))
+#     lastname: Mapped[str] = mapped_column(String(50))
+#     email: Mapped[str] = mapped_column(String(50))
 #     phone: Mapped[str] = mapped_column(String(50))
 #     birthdate: Mapped[str] = mapped_column()
 #     others_info: Mapped[str] = mapped_column(String(250))
@@ -70,7 +70,7 @@ from datetime import datetime, date
 from sqlalchemy.orm import DeclarativeBase, relationship
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import String, Integer, ForeignKey, DateTime, func, Enum, \
-    Boolean
+    Boolean, Index, Text, Computed, Date, extract
 
 
 class Base(DeclarativeBase):
@@ -80,11 +80,11 @@ class Base(DeclarativeBase):
 class Contact(Base):
     __tablename__ = "contacts"
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    name: Mapped[str] = mapped_column(String(50), index=True)
-    lastname: Mapped[str] = mapped_column(String(50), index=True)
-    email: Mapped[str] = mapped_column(String(50), index=True)
+    name: Mapped[str] = mapped_column(String(50))
+    lastname: Mapped[str] = mapped_column(String(50))
+    email: Mapped[str] = mapped_column(String(50))
     phone: Mapped[str] = mapped_column(String(50))
-    birthdate: Mapped[str] = mapped_column()
+    birthdate: Mapped[date] = mapped_column(Date)
     others_info: Mapped[str] = mapped_column(String(250))
     created_at: Mapped[date] = mapped_column('created_at', DateTime,
                                              default=func.now(), nullable=True)
@@ -94,6 +94,27 @@ class Contact(Base):
     completed: Mapped[bool] = mapped_column(default=False)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
     user: Mapped["User"] = relationship("User", backref="contacts", lazy="joined")
+    search_blob: Mapped[str] = mapped_column(
+        Text, Computed("lower(name || ' ' || lastname || ' ' || email)",
+                       persisted=True))
+
+    __table_args__ = (
+        Index("ix_contacts_search_blob_trgm", "search_blob",
+              postgresql_using="gin",
+              postgresql_ops={"search_blob": "gin_trgm_ops"}),
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+    )
+
+
+Index("ix_contacts_bday_mmdd", extract("month", Contact.birthdate),
+      extract("day", Contact.birthdate)).ddl_if(dialect="postgresql")
+# serve the prefix LIKE of search queries shorter than one trigram
+Index("ix_contacts_name_prefix", func.lower(Contact.name).label("name_lower"),
+      postgresql_ops={"name_lower": "text_pattern_ops"})
+Index("ix_contacts_lastname_prefix", func.lower(Contact.lastname).label("lastname_lower"),
+      postgresql_ops={"lastname_lower": "text_pattern_ops"})
+Index("ix_contacts_email_prefix", func.lower(Contact.email).label("email_lower"),
+      postgresql_ops={"email_lower": "text_pattern_ops"})
 
 
 class Role(enum.Enum):
@@ -1,147 +1,210 @@
-from datetime import datetime, timedelta, date
+from datetime import timedelta, date
 from typing import List
 
-from sqlalchemy import select, func, cast, String
+from sqlalchemy import select, insert, update, delete, extract, tuple_, and_, \
+    or_, lambda_stmt, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.entity.models import Contact, User
+from sqlalchemy.orm import joinedload
+from src.entity.models import Contact
 from src.schemas.contacts import ContactUpdateSchema, ContactSchema
+from src.services.auth import CachedUser
 
+# pg_trgm cannot narrow the search down for queries shorter than one trigram
+TRGM_MIN_LENGTH = 3
 
-async def get_contacts(limit: int, offset: int, query: str, db: AsyncSession,
-                       user: User):
+
+def search_pattern(query: str) -> str:
+    """
+    The search_pattern function builds the LIKE pattern for the contact search from the user's query.
+    LIKE wildcards in the query are escaped, so they match literally.
+    :param query: str: Filter the contacts by name, lastname or email
+    :return: A substring pattern, or a prefix pattern for queries shorter than TRGM_MIN_LENGTH
+    """
+    query = query.lower()
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%") \
+        .replace("_", "\\_")
+    if len(query) < TRGM_MIN_LENGTH:
+        return f"{escaped}%"
+    return f"%{escaped}%"
+
+
+def filter_by_query(stmt, query: str):
+    """
+    The filter_by_query function adds the contact search to a lambda statement.
+    Queries shorter than TRGM_MIN_LENGTH match the start of the name, the lastname or the email,
+    longer ones match anywhere in search_blob.
+    :param stmt: StatementLambdaElement: The select of contacts to filter
+    :param query: str: Filter the contacts by name, lastname or email
+    :return: The filtered statement
+    """
+    pattern = search_pattern(query)
+    if len(query) < TRGM_MIN_LENGTH:
+        return stmt + (lambda s: s.filter(or_(
+            func.lower(Contact.name).like(pattern, escape="\\"),
+            func.lower(Contact.lastname).like(pattern, escape="\\"),
+            func.lower(Contact.email).like(pattern, escape="\\"))))
+    return stmt + (lambda s: s.filter(
+        Contact.search_blob.like(pattern, escape="\\")))
+
+
+async def get_contacts(limit: int, after_id: int | None, query: str,
+                       db: AsyncSession, user: CachedUser):
     """
     The get_contacts function returns a list of contacts for a given user.
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :param limit: int: Limit the number of contacts returned
-    :param offset: int: Skip a certain number of contacts
+    :param after_id: int | None: Return only contacts with a greater id, the id of the last contact of the previous page
     :param query: str: Filter the contacts by name, lastname or email
     :param db: AsyncSession: Access the database
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A list of contacts for the given user
     """
-    stmt = select(Contact).filter_by(user=user).offset(offset).limit(limit)
+    user_id = user.id
+    # the owner is serialized with every contact; load it in the same SELECT
+    stmt = lambda_stmt(lambda: select(Contact).options(
+        joinedload(Contact.user)))
+    stmt += lambda s: s.where(Contact.user_id == user_id)
     if query:
-        stmt = stmt.filter(
-            (Contact.name.ilike(f"%{query}%")) |
-            (Contact.lastname.ilike(f"%{query}%")) |
-            (Contact.email.ilike(f"%{query}%"))
-        )
-    contacts = await db.execute(stmt)
-    return contacts.scalars().all()
+        stmt = filter_by_query(stmt, query)
+    if after_id is not None:
+        stmt += lambda s: s.where(Contact.id > after_id)
+    stmt += lambda s: s.order_by(Contact.id).limit(limit)
+    contacts = await db.scalars(stmt)
+    return contacts.all()
 
 
-async def get_all_contacts(limit: int, offset: int, query: str,
+async def get_all_contacts(limit: int, after_id: int | None, query: str,
                            db: AsyncSession):
     """
     The get_all_contacts function returns a list of all contacts.
 
     :param limit: int: Limit the number of contacts returned
-    :param offset: int: Skip a certain number of contacts
+    :param after_id: int | None: Return only contacts with a greater id, the id of the last contact of the previous page
     :param query: str: Filter the contacts by name, lastname or email
     :param db: AsyncSession: Access the database
     :return: A list of contacts for the given user
     """
-    stmt = select(Contact).offset(offset).limit(limit)
+    stmt = lambda_stmt(lambda: select(Contact).options(
+        joinedload(Contact.user)))
     if query:
-        stmt = stmt.filter(
-            (Contact.name.ilike(f"%{query}%")) |
-            (Contact.lastname.ilike(f"%{query}%")) |
-            (Contact.email.ilike(f"%{query}%"))
-        )
-    contacts = await db.execute(stmt)
-    return contacts.scalars().all()
+        stmt = filter_by_query(stmt, query)
+    if after_id is not None:
+        stmt += lambda s: s.where(Contact.id > after_id)
+    stmt += lambda s: s.order_by(Contact.id).limit(limit)
+    contacts = await db.scalars(stmt)
+    return contacts.all()
 
 
-async def get_contact(contact_id: int, db: AsyncSession, user: User):
+async def get_contact(contact_id: int, db: AsyncSession, user: CachedUser):
     """
     The get_contact function returns the contact with the given contact_id.
 
     :param contact_id: int: Specify the id of the contact to get from the database
     :param db: AsyncSession: Pass the database session
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A contact object with the given id from the database
     """
-    stmt = select(Contact).filter_by(id=contact_id, user=user)
-    contact = await db.execute(stmt)
-    return contact.scalars().first()
+    user_id = user.id
+    stmt = lambda_stmt(lambda: select(Contact).options(
+        joinedload(Contact.user)))
+    stmt += lambda s: s.where(Contact.id == contact_id,
+                              Contact.user_id == user_id)
+    return await db.scalar(stmt)
 
 
-async def create_contact(body: ContactSchema, db: AsyncSession, user: User):
+async def create_contact(body: ContactSchema, db: AsyncSession, user: CachedUser):
     """
     The create_contact function creates a new contact in the database.
 
     :param body: ContactSchema: Get the data from the request body
     :param db: AsyncSession: Pass the database session to the function
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A contact object with the new data from the request body
     """
-    contact = Contact(**body.model_dump(exclude_unset=True), user=user)
+    contact = Contact(**body.model_dump(exclude_unset=True), user_id=user.id)
     db.add(contact)
     await db.commit()
-    await db.refresh(contact)
     return contact
 
 
+async def create_contacts_bulk(bodies: List[ContactSchema], db: AsyncSession,
+                               user: CachedUser):
+    """
+    The create_contacts_bulk function creates many contacts in the database with a single batched INSERT.
+
+    :param bodies: List[ContactSchema]: Get the data of the contacts from the request body
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: CachedUser: The current user
+    :return: A list of ids of the created contacts, in the order of the bodies
+    """
+    if not bodies:
+        return []
+    rows = [body.model_dump(exclude_unset=True) | {"user_id": user.id}
+            for body in bodies]
+    # insertmanyvalues may split the rows into several batches; keep the ids in input order anyway
+    ids = await db.scalars(
+        insert(Contact).returning(Contact.id, sort_by_parameter_order=True), rows)
+    ids = ids.all()
+    await db.commit()
+    return ids
+
+
 async def update_contact(contact_id: int, body: ContactUpdateSchema,
-                         db: AsyncSession, user: User):
+                         db: AsyncSession, user: CachedUser):
     """
     The update_contact function updates a contact in the database.
 
     :param contact_id: int: Specify the id of the contact to be updated in the database
     :param body: ContactUpdateSchema: Pass the data to be updated in the database
     :param db: AsyncSession: Pass the database session to the function
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A contact object with the updated data from the database
     """
-    stmt = select(Contact).filter_by(id=contact_id, user=user)
-    result = await db.execute(stmt)
-    contact = result.scalars().first()
-    if contact:
-        contact.name = body.name
-        contact.lastname = body.lastname
-        contact.email = body.email
-        contact.phone = body.phone
-        contact.birthdate = body.birthdate
-        contact.others_info = body.others_info
-        contact.completed = body.completed
-        await db.commit()
-        await db.refresh(contact)
+    stmt = update(Contact).where(
+        Contact.id == contact_id, Contact.user_id == user.id
+    ).values(**body.model_dump()).returning(Contact).execution_options(
+        synchronize_session="fetch")
+    contact = await db.scalar(stmt)
+    await db.commit()
     return contact
-    pass
 
 
-async def delete_contact(contact_id: int, db: AsyncSession, user: User):
+async def delete_contact(contact_id: int, db: AsyncSession, user: CachedUser):
     """
     The delete_contact function deletes a contact from the database.
     :param contact_id: int: Specify the id of the contact to be deleted from the database
     :param db: AsyncSession: Pass the database session to the function
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A contact object with the given id from the database
     """
-    stmt = select(Contact).filter_by(id=contact_id, user=user)
-    stmt = select(Contact).filter_by(id=contact_id, user=user)
-    contact = await db.execute(stmt)
-    contact = contact.scalars().first()
-    if contact:
-        await db.delete(contact)
-        await db.commit()
+    stmt = delete(Contact).where(
+        Contact.id == contact_id, Contact.user_id == user.id
+    ).returning(Contact)
+    contact = await db.scalar(stmt)
+    await db.commit()
     return contact
 
-# async def get_upcoming_birthdays(db: AsyncSession, user: User):
-#     today = datetime.now().date()
-#     next_week = today + timedelta(days=7)
-#     stmt = select(Contact).filter(
-#         func.DATE_FORMAT(cast(Contact.birthdate, String),
-#                          "%d.%m") >= func.DATE_FORMAT(today, "%d.%m"),
-#         func.DATE_FORMAT(cast(Contact.birthdate, String),
-#                          "%d.%m") <= func.DATE_FORMAT(next_week, "%d.%m"))
-#     contacts = await db.execute(stmt)
-#     upcoming_birthdays = []
-#     for contact in contacts.scalars().all():
-#         # Convert birthdate from string to date format
-#         birthdate = datetime.strptime(contact.birthdate, "%d.%m.%Y").date()
-#         contact_dict = contact.__dict__
-#         contact_dict["birthdate"] = birthdate
-#         upcoming_birthdays.append(contact_dict)
-#
-#     return upcoming_birthdays
+
+async def get_upcoming_birthdays(days: int, db: AsyncSession, user: CachedUser):
+    """
+    The get_upcoming_birthdays function returns the contacts of the user whose birthday falls within the next days.
+    :param days: int: Number of days ahead to look for birthdays, today included
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: CachedUser: The current user
+    :return: A list of contacts with upcoming birthdays
+    """
+    today = date.today()
+    last_day = today + timedelta(days=days)
+    bday = tuple_(extract("month", Contact.birthdate),
+                  extract("day", Contact.birthdate))
+    start = tuple_(today.month, today.day)
+    end = tuple_(last_day.month, last_day.day)
+    if (last_day.month, last_day.day) < (today.month, today.day):
+        # the window wraps around new year, e.g. 28.12 - 04.01
+        in_window = or_(bday >= start, bday <= end)
+    else:
+        in_window = and_(bday >= start, bday <= end)
+    stmt = select(Contact).options(joinedload(Contact.user)).where(
+        Contact.user_id == user.id, in_window)
+    contacts = await db.scalars(stmt)
+    return contacts.all()
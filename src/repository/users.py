@@ -1,5 +1,5 @@
 from fastapi import Depends
-from sqlalchemy import select
+from sqlalchemy import select, exists, lambda_stmt
 from sqlalchemy.ext.asyncio import AsyncSession
 from libgravatar import Gravatar
 from src.database.db import get_db
@@ -7,17 +7,40 @@ from src.entity.models import User
 from src.schemas.user import UserSchema
 
 
+async def drop_cached_user(email: str) -> None:
+    """
+    The drop_cached_user function removes the user cached by auth_service.get_current_user, in Redis and in this
+    process, so the next request reads the fresh row from the database.
+    :param email: str: Email of the user, used as the cache key
+    :return: None
+    """
+    # imported here: src.services.auth depends on this module
+    from src.services.auth import auth_service
+    await auth_service.forget_user(email)
+
+
 async def get_user_by_email(email: str, db: AsyncSession = Depends(get_db)):
     """
     The get_user_by_email function takes in an email and a database session, and returns the user with that email.
+    Callers mutate the returned user, so it is always read through the session; the per-request read through Redis
+    lives in auth_service.get_current_user.
     :param email: str: Specify the type of the parameter to be a string or a string literal (e.g. "email")
     :param db: AsyncSession: Pass the database session to the function
     :return: A user object with the email passed in the parameter
     """
-    stmt = select(User).filter_by(email=email)
-    user = await db.execute(stmt)
-    user = user.scalars().first()
-    return user
+    stmt = lambda_stmt(lambda: select(User))
+    stmt += lambda s: s.where(User.email == email)
+    return await db.scalar(stmt)
+
+
+async def user_exists(email: str, db: AsyncSession) -> bool:
+    """
+    The user_exists function checks whether a user with the given email is registered, without loading the row.
+    :param email: str: Email to look for
+    :param db: AsyncSession: Pass the database session to the function
+    :return: True if the user exists, False otherwise
+    """
+    return await db.scalar(select(exists().where(User.email == email)))
 
 
 async def create_user(body: UserSchema, db: AsyncSession = Depends(get_db)):
@@ -28,6 +51,7 @@ async def create_user(body: UserSchema, db: AsyncSession = Depends(get_db)):
     :return: A user object with the data from the request body
     """
     avatar = None
+    # the avatar url is built locally from the md5 of the email, no HTTP request is made
     try:
         g = Gravatar(body.email)
         avatar = g.get_image()
@@ -37,7 +61,6 @@ async def create_user(body: UserSchema, db: AsyncSession = Depends(get_db)):
     new_user = User(**body.model_dump(), avatar=avatar)
     db.add(new_user)
     await db.commit()
-    await db.refresh(new_user)
     return new_user
 
 
@@ -50,6 +73,7 @@ async def update_token(user: User, token: str | None, db: AsyncSession):
     :return: None
     """
     user.refresh_token = token
+    # the refresh token is not part of the cached user, so the cache stays valid
     await db.commit()
 
 
@@ -63,6 +87,7 @@ async def confirmed_email(email: str, db: AsyncSession) -> None:
     user = await get_user_by_email(email, db)
     user.confirmed = True
     await db.commit()
+    await drop_cached_user(email)
 
 
 async def update_avatar_url(email: str, url: str | None, db: AsyncSession)-> User:
@@ -77,4 +102,5 @@ async def update_avatar_url(email: str, url: str | None, db: AsyncSession)-> Use
     user.avatar = url
     await db.commit()
     await db.refresh(user)
+    await drop_cached_user(email)
     return user
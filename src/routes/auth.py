@@ -1,3 +1,5 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status, Security, \
     BackgroundTasks, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm, \
@@ -11,6 +13,7 @@ from src.services.auth import auth_service
 from src.services.email import send_email
 from src.conf import messages
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["auth"])
 get_refresh_token = HTTPBearer()
 
@@ -28,10 +31,9 @@ async def signup(body: UserSchema, bt: BackgroundTasks, request: Request,
     :return: A user object with the new data from the request body
     """
     try:
-        exist_user = await repository_users.get_user_by_email(body.email, db)
-        if exist_user:
+        if await repository_users.user_exists(body.email, db):
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=messages.ACCOUNT_EXIST)
-        body.password = auth_service.get_password_hash(body.password)
+        body.password = await auth_service.get_password_hash(body.password)
         new_user = await repository_users.create_user(body, db)
         bt.add_task(send_email, new_user.email, new_user.username,
                     str(request.base_url))
@@ -57,9 +59,13 @@ async def login(body: OAuth2PasswordRequestForm = Depends(),
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail=messages.EMAIL_NOT_CONFIRMED)
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail=messages.INCORRECT_PASSWORD)
+    if new_hash is not None:
+        # saved by the commit in update_token below
+        user.password = new_hash
     access_token = await auth_service.create_access_token(
         data={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(
@@ -144,8 +150,6 @@ async def request_email(username: str, response: Response,
     :param db: AsyncSession: Pass the database session to the function
     :return: A message confirming that the email has been sent
     """
-    print("-------------------------------------------------")
-    print(f"{username} Save that the user open email in DB")
-    print("-------------------------------------------------")
+    logger.info("%s opened the confirmation email", username)
     return FileResponse("src/static/open_check.png", media_type="image/png",
                         content_disposition_type="inline")
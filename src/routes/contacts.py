@@ -1,70 +1,108 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, \
+    Response, Body
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.db import get_db
-from src.entity.models import User, Role
+from src.entity.models import Role
 from src.repository import contacts as repository_contacts
 from src.schemas.contacts import ContactResponse, ContactUpdateSchema, \
     ContactSchema
 from typing import List, Optional
-from src.services.auth import auth_service
+from src.services.auth import CachedUser, get_current_user
 from src.services.roles import RoleAccess
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 access_to_route_all = RoleAccess([Role.admin, Role.moderator])
 
+contacts_adapter = TypeAdapter(List[ContactResponse])
 
-@router.get("/", response_model=List[ContactResponse],
-            response_model_exclude_unset=True)
+# largest import accepted by POST /bulk; it runs as a single transaction
+BULK_CREATE_LIMIT = 1000
+
+
+def contacts_response(contacts, limit: int | None = None) -> Response:
+    """
+    Serialize a list of contacts in one pass, without FastAPI re-validating every item against the response model.
+    When a full page of limit contacts is returned, the X-Next-Cursor header holds the after_id of the next page.
+    :param contacts: Contacts from the repository
+    :param limit: int: Page size the contacts were requested with
+    :return: JSON response with the contacts
+    """
+    headers = {}
+    if limit is not None and len(contacts) == limit:
+        headers["X-Next-Cursor"] = str(contacts[-1].id)
+    contacts = contacts_adapter.validate_python(contacts, from_attributes=True)
+    return Response(content=contacts_adapter.dump_json(contacts),
+                    media_type="application/json", headers=headers)
+
+
+@router.get("/", response_model=List[ContactResponse])
 async def get_contacts(limit: int = Query(default=10, ge=10, le=500),
-                       offset: int = Query(default=0, ge=0),
+                       after_id: Optional[int] = Query(default=None, ge=0),
                        query: Optional[str] = None,
                        db: AsyncSession = Depends(get_db),
-                       user: User = Depends(auth_service.get_current_user)):
+                       user: CachedUser = Depends(get_current_user)):
     """
     The get_contacts function returns a list of contacts for a given user.
     :param limit:
-    :param offset:
+    :param after_id: id of the last contact of the previous page, see the X-Next-Cursor header
     :param query:
     :param db:
     :param user:
     :return:
     """
-    contacts = await repository_contacts.get_contacts(limit, offset, query,
+    contacts = await repository_contacts.get_contacts(limit, after_id, query,
                                                       db, user)
-    return contacts
+    return contacts_response(contacts, limit)
 
 
 @router.get("/all", response_model=List[ContactResponse],
             dependencies=[Depends(access_to_route_all)])
 async def get_all_contacts(limit: int = Query(default=10, ge=10, le=500),
-                           offset: int = Query(default=0, ge=0),
+                           after_id: Optional[int] = Query(default=None, ge=0),
                            query: Optional[str] = None,
                            db: AsyncSession = Depends(get_db),
-                           user: User = Depends(auth_service.get_current_user)):
+                           user: CachedUser = Depends(get_current_user)):
     """
     The get_all_contacts function returns a list of all contacts.
     :param limit:
-    :param offset:
+    :param after_id: id of the last contact of the previous page, see the X-Next-Cursor header
     :param query:
     :param db:
     :param user:
     :return:
     """
-    contacts = await repository_contacts.get_all_contacts(limit, offset, query,
-                                                          db)
+    contacts = await repository_contacts.get_all_contacts(limit, after_id,
+                                                          query, db)
+    return contacts_response(contacts, limit)
+
+
+@router.get("/birthdays", response_model=List[ContactResponse])
+async def get_upcoming_birthdays(days: int = Query(default=7, ge=1, le=30),
+                                 db: AsyncSession = Depends(get_db),
+                                 user: CachedUser = Depends(
+                                     get_current_user)):
+    """
+    The get_upcoming_birthdays function returns the contacts whose birthday is within the next days.
+    :param days: int: Number of days ahead to look for birthdays
+    :param db: AsyncSession: Pass the database session
+    :param user: CachedUser: The current user
+    :return: A list of contacts with upcoming birthdays
+    """
+    contacts = await repository_contacts.get_upcoming_birthdays(days, db, user)
     return contacts
 
 
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def get_contact(contact_id: int = Path(ge=1),
                       db: AsyncSession = Depends(get_db),
-                      user: User = Depends(auth_service.get_current_user)):
+                      user: CachedUser = Depends(get_current_user)):
     """
     The get_contact function returns the contact with the given contact_id.
     :param contact_id: int: Specify the id of the contact to get from the database
     :param db: AsyncSession: Pass the database session
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A contact object with the given id from the database
     """
     contact = await repository_contacts.get_contact(contact_id, db, user)
@@ -78,29 +116,47 @@ async def get_contact(contact_id: int = Path(ge=1),
              status_code=status.HTTP_201_CREATED)
 async def create_contact(body: ContactSchema,
                          db: AsyncSession = Depends(get_db),
-                         user: User = Depends(auth_service.get_current_user)):
+                         user: CachedUser = Depends(get_current_user)):
     """
     The create_contact function creates a new contact in the database.
     :param body: ContactSchema: Get the data from the request body
     :param db: AsyncSession: Pass the database session
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A contact object
     """
     contact = await repository_contacts.create_contact(body, db, user)
-    return contact
+    return ContactResponse.with_owner(contact, user)
+
+
+@router.post("/bulk", response_model=List[int],
+             status_code=status.HTTP_201_CREATED)
+async def create_contacts_bulk(bodies: List[ContactSchema] = Body(
+                                   max_length=BULK_CREATE_LIMIT),
+                               db: AsyncSession = Depends(get_db),
+                               user: CachedUser = Depends(
+                                   get_current_user)):
+    """
+    The create_contacts_bulk function creates many contacts in the database at once.
+    :param bodies: List[ContactSchema]: Get the data of the contacts from the request body
+    :param db: AsyncSession: Pass the database session
+    :param user: CachedUser: The current user
+    :return: A list of ids of the created contacts, in the order of the bodies
+    """
+    ids = await repository_contacts.create_contacts_bulk(bodies, db, user)
+    return ids
 
 
-@router.put("/{contact_id}")
+@router.put("/{contact_id}", response_model=ContactResponse)
 async def update_contact(body: ContactUpdateSchema,
                          contact_id: int = Path(ge=1),
                          db: AsyncSession = Depends(get_db),
-                         user: User = Depends(auth_service.get_current_user)):
+                         user: CachedUser = Depends(get_current_user)):
     """
     The update_contact function updates a contact in the database.
     :param contact_id: int: Specify the id of the contact to be updated in the database
     :param body: ContactUpdateSchema: Pass the data to be updated in the database
     :param db: AsyncSession: Pass the database session to the function
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A contact object with the updated data from the database
     """
     contact = await repository_contacts.update_contact(contact_id, body, db,
@@ -108,29 +164,22 @@ async def update_contact(body: ContactUpdateSchema,
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Contact not found")
-    return contact
+    return ContactResponse.with_owner(contact, user)
 
 
 @router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_contact(contact_id: int = Path(ge=1),
                          db: AsyncSession = Depends(get_db),
-                         user: User = Depends(auth_service.get_current_user)):
+                         user: CachedUser = Depends(get_current_user)):
     """
     The delete_contact function deletes a contact from the database.
     :param contact_id: int: Specify the id of the contact to be deleted from the database
     :param db: AsyncSession: Pass the database session to the function
-    :param user: User: Get the user from the database
+    :param user: CachedUser: The current user
     :return: A contact object with the given id from the database
     """
-    contact = await repository_contacts.get_contact(contact_id, db, user)
+    contact = await repository_contacts.delete_contact(contact_id, db, user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Contact not found")
-    contact = await repository_contacts.delete_contact(contact_id, db, user)
     return contact
-
-#
-# @router.get("/birthdays", response_model=List[ContactResponse])
-# async def get_upcoming_birthdays(db: AsyncSession = Depends(get_db)):
-#     contacts = await repository_contacts.get_upcoming_birthdays(db)
-#     return contacts
@@ -1,4 +1,3 @@
-import pickle
 import cloudinary
 import cloudinary.uploader
 from fastapi import APIRouter, Depends, UploadFile, File
@@ -6,9 +5,9 @@ from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
-from src.entity.models import User
 from src.schemas.user import UserResponse
-from src.services.auth import auth_service
+# aliased: the route handlers below are named get_current_user
+from src.services.auth import auth_service, CachedUser, get_current_user as current_user
 from src.conf.config import config
 from src.repository import users as repository_users
 
@@ -26,7 +25,7 @@ cloudinary.config(
     response_model=UserResponse,
     dependencies=[Depends(RateLimiter(times=1, seconds=20))],
 )
-async def get_current_user(user: User = Depends(auth_service.get_current_user)):
+async def get_current_user(user: CachedUser = Depends(current_user)):
     """
     Get current user
     :param user:
@@ -38,7 +37,7 @@ async def get_current_user(user: User = Depends(auth_service.get_current_user)):
 @router.patch("/avatar", response_model=UserResponse,
               dependencies=[Depends(RateLimiter(times=1, seconds=20))], )
 async def get_current_user(file: UploadFile = File(),
-                           user: User = Depends(auth_service.get_current_user),
+                           user: CachedUser = Depends(current_user),
                            db: AsyncSession = Depends(get_db), ):
     """
     Update user avatar
@@ -50,13 +49,11 @@ async def get_current_user(file: UploadFile = File(),
     public_id = f"hw_14/{user.email}"
     res = cloudinary.uploader.upload(file.file, public_id=public_id,
                                      owerite=True)
-    print(res)
     res_url = cloudinary.CloudinaryImage(public_id).build_url(width=250,
                                                               height=250,
                                                               crop="fill",
                                                               version=res.get(
                                                                   "version"))
     user = await repository_users.update_avatar_url(user.email, res_url, db)
-    auth_service.cache.set(user.email, pickle.dumps(user))
-    auth_service.cache.expire(user.email, 300)
+    await auth_service.cache_user(CachedUser.from_user(user))
     return user
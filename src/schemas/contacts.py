@@ -1,19 +1,32 @@
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, field_validator, \
+    field_serializer
 
 from src.schemas.user import UserResponse
 
+BIRTHDATE_FORMAT = "%d.%m.%Y"
+
 
 class ContactSchema(BaseModel):
     name: str = Field(min_length=3, max_length=50)
     lastname: str = Field(min_length=3, max_length=50)
     email: EmailStr
     phone: str = Field(min_length=7, max_length=50)
-    birthdate: str = Field(min_length=7, max_length=50)
+    birthdate: date
     others_info: str = Field(min_length=5, max_length=250)
     completed: Optional[bool] = False
 
+    @field_validator("birthdate", mode="before")
+    @classmethod
+    def parse_birthdate(cls, v):
+        if isinstance(v, str):
+            try:
+                return datetime.strptime(v, BIRTHDATE_FORMAT).date()
+            except ValueError:
+                pass
+        return v
+
 
 class ContactUpdateSchema(ContactSchema):
     completed: bool
@@ -25,12 +38,26 @@ class ContactResponse(BaseModel):
     lastname: str
     email: EmailStr
     phone: str
-    birthdate: str
+    birthdate: date
     others_info: str | None
     completed: bool | None
     created_at: datetime | None
     updated_at: datetime | None
     user: UserResponse | None
 
-    class Config:
-        model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def with_owner(cls, contact, owner) -> "ContactResponse":
+        """
+        :param contact: Contact: Contact whose user relationship is not loaded
+        :param owner: CachedUser: The current user, who owns the contact
+        :return: The response of the contact, without loading Contact.user
+        """
+        fields = {name: getattr(contact, name) for name in cls.model_fields
+                  if name != "user"}
+        return cls(**fields, user=UserResponse.model_validate(owner))
+
+    @field_serializer("birthdate")
+    def serialize_birthdate(self, v: date):
+        return v.strftime(BIRTHDATE_FORMAT)
@@ -17,7 +17,7 @@ class UserResponse(BaseModel):
     avatar: str | None
     role: Role
 
-    class Config: frozen = False
+    model_config = ConfigDict(from_attributes=True)
 
 
 class TokenSchema(BaseModel):
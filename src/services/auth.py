@@ -1,17 +1,80 @@
-import redis
-import pickle
+import time
+import asyncio
+import base64
+import jwt
+import msgpack
 
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import timedelta
 from typing import Optional
+from cachetools import TLRUCache
 from fastapi import Depends, HTTPException, status
 from passlib.context import CryptContext
+from redis import asyncio as aioredis
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from jose import JWTError, jwt
+from jwt import PyJWK, PyJWTError
 
 from src.database.db import get_db
 from src.repository import users as repository_users
 from src.conf.config import config
+from src.entity.models import User, Role
+
+
+@dataclass(slots=True)
+class CachedUser:
+    """
+    Slim projection of the User row, kept in Redis and returned by Auth.get_current_user.
+    It carries every field of UserResponse plus what the routes check, but is not bound to any session.
+    """
+    id: int
+    username: str
+    email: str
+    role: Role | None
+    confirmed: bool | None
+    avatar: str | None
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        """
+        :param user: User: User loaded from the database
+        :return: The cached projection of the user
+        """
+        return cls(id=user.id, username=user.username, email=user.email,
+                   role=user.role, confirmed=user.confirmed,
+                   avatar=user.avatar)
+
+    def pack(self) -> bytes:
+        """
+        :return: The user serialized with msgpack for the Redis cache
+        """
+        return msgpack.packb(
+            {"id": self.id, "username": self.username, "email": self.email,
+             "role": self.role.value if self.role else None,
+             "confirmed": self.confirmed, "avatar": self.avatar},
+            use_bin_type=True)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "CachedUser":
+        """
+        :param data: bytes: User serialized by CachedUser.pack
+        :return: The cached user
+        """
+        fields = msgpack.unpackb(data, raw=False)
+        fields["role"] = Role(fields["role"]) if fields["role"] else None
+        return cls(**fields)
+
+
+redis_pool = aioredis.ConnectionPool(
+    host=config.REDIS_DOMAIN,
+    port=config.REDIS_PORT,
+    db=0,
+    password=config.REDIS_PASSWORD,
+    decode_responses=False,
+    socket_keepalive=True,
+    health_check_interval=30,
+    max_connections=50,
+)
 
 
 class Auth:
@@ -19,34 +82,63 @@ class Auth:
     Class for working with JWT tokens and hashing passwords in the application and database for authentication.
 
     """
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    # new hashes are argon2 (OWASP minimum parameters); bcrypt hashes still verify and are upgraded on login
+    pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto",
+                               argon2__memory_cost=19456, argon2__time_cost=2,
+                               argon2__parallelism=1,
+                               bcrypt__ident="2b", bcrypt__rounds=12)
     SECRET_KEY = config.SECRET_KEY_JWT
     ALGORITHM = config.ALGORITHM
-    cache = redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
+    # prepared once and bound to ALGORITHM, instead of preparing the secret on every encode and decode
+    SIGNING_KEY = PyJWK({
+        "kty": "oct",
+        "k": base64.urlsafe_b64encode(SECRET_KEY.encode()).rstrip(b"=").decode(),
+    }, ALGORITHM)
+    # only exp, sub and scope are ever issued; skip the checks for the other registered claims
+    DECODE_OPTIONS = {"verify_aud": False, "verify_iss": False, "verify_nbf": False, "verify_iat": False,
+                      "require": ["exp", "sub", "scope"]}
+    # email tokens carry no scope
+    EMAIL_DECODE_OPTIONS = {**DECODE_OPTIONS, "require": ["exp", "sub"]}
+    cache = aioredis.Redis(connection_pool=redis_pool)
+    # access token -> (CachedUser, exp); an entry lives at most TOKEN_CACHE_TTL seconds and never past the token's exp,
+    # so a user change made on another worker is picked up within TOKEN_CACHE_TTL
+    TOKEN_CACHE_TTL = 30
+    token_cache = TLRUCache(
+        maxsize=10_000,
+        ttu=lambda token, entry, now: min(now + Auth.TOKEN_CACHE_TTL, entry[1]),
+        timer=time.time,
     )
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_and_update_password(self, plain_password, hashed_password):
         """
-        The verify_password function takes in a plain text password and hashed password, and returns True if the
-        password is correct and False if it is not.
-        :param plain_password: str: Pass in the plain text password that the user enters in the password field in the
-        :param hashed_password: str: Pass in the hashed password from the database
-        :return: A boolean
+        The verify_and_update_password function checks the plain text password against the hashed password, and also
+        returns a new hash when the stored one uses a deprecated scheme or parameters.
+        :param plain_password: str: The plain text password the user entered
+        :param hashed_password: str: The hashed password from the database
+        :return: A tuple of the verification result and the new hash, or None if the stored hash is up to date
         """
-        print(plain_password, hashed_password)
-        return self.pwd_context.verify(plain_password, hashed_password)
+        # argon2 and bcrypt are CPU bound and release the GIL, run them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.pwd_context.verify_and_update, plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
+    async def get_password_hash(self, password: str):
         """
         The get_password_hash function takes a password as input and returns the password hash.
         :param password: str: Get the password from the user input field in the frontend application
         :return: The password hash of the password that was passed in the function call
         """
-        return self.pwd_context.hash(password)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.pwd_context.hash, password)
+
+    @classmethod
+    def warmup(cls):
+        """
+        The warmup function hashes and verifies a dummy password with every scheme of pwd_context, so passlib loads
+        its backends at startup rather than on the first login.
+        :return: None
+        """
+        for scheme in cls.pwd_context.schemes():
+            cls.pwd_context.verify("warmup", cls.pwd_context.handler(scheme).hash("warmup"))
 
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -59,13 +151,12 @@ class Auth:
         :return: A string which is the access token for the user to be able to access the application with their credentials
         """
         to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + timedelta(seconds=expires_delta)
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=15)
+        # one clock read; iat/exp go out as epoch seconds, which is what the encoder would turn datetimes into
+        now = int(time.time())
+        expire = now + int(expires_delta or timedelta(minutes=15).total_seconds())
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"})
-        encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY,
+            {"iat": now, "exp": expire, "scope": "access_token"})
+        encoded_access_token = jwt.encode(to_encode, self.SIGNING_KEY,
                                           algorithm=self.ALGORITHM)
         return encoded_access_token
 
@@ -78,13 +169,11 @@ class Auth:
         :return: A string which is the refresh token for the user to be able to get a new access token when it expires in 7 days or less
         """
         to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + timedelta(seconds=expires_delta)
-        else:
-            expire = datetime.utcnow() + timedelta(days=7)
+        now = int(time.time())
+        expire = now + int(expires_delta or timedelta(days=7).total_seconds())
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
-        encoded_refresh_token = jwt.encode(to_encode, self.SECRET_KEY,
+            {"iat": now, "exp": expire, "scope": "refresh_token"})
+        encoded_refresh_token = jwt.encode(to_encode, self.SIGNING_KEY,
                                            algorithm=self.ALGORITHM)
         return encoded_refresh_token
 
@@ -95,14 +184,15 @@ class Auth:
         :return: A string which is the email address of the user who is trying to refresh their access token
         """
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY,
-                                 algorithms=[self.ALGORITHM])
-            if payload['score'] == "refresh_token":
-                email = payload["sub"]
+            payload = jwt.decode(refresh_token, self.SIGNING_KEY,
+                                 algorithms=[self.ALGORITHM],
+                                 options=self.DECODE_OPTIONS)
+            email = payload.get("sub")
+            if payload.get("scope") == "refresh_token" and email is not None:
                 return email
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail="Invalid scope for requested token")
-        except JWTError:
+        except PyJWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail="Could not validate credentials")
 
@@ -112,41 +202,66 @@ class Auth:
         The get_current_user function takes a token and returns the user associated with that token.
         :param token: str: Get the token from the request headers
         :param db: AsyncSession: Pass the database session to the repository functions
-        :return: A dictionary with the user's email and scope access or raise an exception if the token is invalid or expired
+        :return: The CachedUser of the token's owner or raise an exception if the token is invalid or expired
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+        cached = self.token_cache.get(token)
+        if cached is not None:
+            return cached[0]
         try:
-            payload = jwt.decode(token, self.SECRET_KEY,
-                                 algorithms=[self.ALGORITHM])
-            if payload['scope'] == "access_token":
-                email = payload["sub"]
+            payload = jwt.decode(token, self.SIGNING_KEY,
+                                 algorithms=[self.ALGORITHM],
+                                 options=self.DECODE_OPTIONS)
+            if payload.get("scope") == "access_token":
+                email = payload.get("sub")
                 if email is None:
                     raise credentials_exception
             else:
                 raise credentials_exception
-        except JWTError as e:
+        except PyJWTError as e:
             raise credentials_exception
 
-        user_hash = str(email)
-
-        user = self.cache.get(user_hash)
+        user = None
+        packed = await self.cache.get(email)
+        if packed is not None:
+            try:
+                user = CachedUser.unpack(packed)
+            except (ValueError, TypeError, KeyError):
+                # written by an older release or corrupted: treat as a miss, cache_user overwrites it
+                user = None
 
         if user is None:
-            print("User from database")
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None:
+            db_user = await repository_users.get_user_by_email(email, db)
+            if db_user is None:
                 raise credentials_exception
-            self.cache.set(user_hash, pickle.dumps(user))
-            self.cache.expire(user_hash, 300)
-        else:
-            print("User from cache")
-            user = pickle.loads(user)
+            user = CachedUser.from_user(db_user)
+            await self.cache_user(user)
+        self.token_cache[token] = (user, payload["exp"])
         return user
 
+    async def cache_user(self, user: CachedUser):
+        """
+        The cache_user function stores the user in Redis for get_current_user, for 5 minutes.
+        :param user: CachedUser: The user to cache
+        :return: None
+        """
+        await self.cache.set(user.email, user.pack(), ex=300)
+
+    async def forget_user(self, email: str):
+        """
+        The forget_user function drops the cached user from Redis and from this process's token cache.
+        :param email: str: The email of the changed user
+        :return: None
+        """
+        await self.cache.delete(email)
+        for token, (user, _) in list(self.token_cache.items()):
+            if user.email == email:
+                self.token_cache.pop(token, None)
+
     def create_email_token(self, data: dict):
         """
         The create_email_token function takes in a dictionary of data and returns a token.
@@ -154,9 +269,9 @@ class Auth:
         :return: A token string which is valid for 15 minutes from the time it is created
         """
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=1)
-        to_encode.update({"iat": datetime.utcnow(), "exp": expire})
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        now = int(time.time())
+        to_encode.update({"iat": now, "exp": now + int(timedelta(days=1).total_seconds())})
+        token = jwt.encode(to_encode, self.SIGNING_KEY, algorithm=self.ALGORITHM)
         return token
 
     async def get_email_from_token(self, token: str):
@@ -166,13 +281,26 @@ class Auth:
         :return: A string which is the email address of the user who is trying to reset their password
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY,
-                                 algorithms=[self.ALGORITHM])
+            payload = jwt.decode(token, self.SIGNING_KEY,
+                                 algorithms=[self.ALGORITHM],
+                                 options=self.EMAIL_DECODE_OPTIONS)
             email = payload["sub"]
             return email
-        except JWTError:
+        except PyJWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail="Could not validate credentials")
 
 
 auth_service = Auth()
+
+
+async def get_current_user(token: str = Depends(Auth.oauth2_scheme),
+                           db: AsyncSession = Depends(get_db)) -> CachedUser:
+    """
+    The get_current_user function is the route dependency for auth_service.get_current_user. A plain function is one
+    stable dependency key, so FastAPI resolves it once per request however many dependants share it.
+    :param token: str: Get the token from the request headers
+    :param db: AsyncSession: Pass the database session to the repository functions
+    :return: The CachedUser of the token's owner
+    """
+    return await auth_service.get_current_user(token, db)
@@ -1,8 +1,10 @@
 import asyncio
+from unittest.mock import AsyncMock
 
 import pytest
-import pytest_asyncio
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session, raiseload
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
@@ -17,7 +19,21 @@ engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
 )
 
-TestingSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+class TestingSession(Session):
+    pass
+
+
+@event.listens_for(TestingSession, "do_orm_execute")
+def raise_on_lazy_load(orm_execute_state):
+    # a relationship that a query does not load explicitly raises here instead of issuing a SELECT per row
+    if orm_execute_state.is_select and not orm_execute_state.is_column_load \
+            and not orm_execute_state.is_relationship_load:
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*"))
+
+
+TestingSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine,
+                                         sync_session_class=TestingSession)
 
 test_user = {"username": "deadpool", "email": "deadpool@google.com", "password": "12345678"}
 
@@ -30,7 +46,7 @@ def init_models_wrap():
             await conn.run_sync(Base.metadata.drop_all)
             await conn.run_sync(Base.metadata.create_all)
         async with TestingSessionLocal() as session:
-            hash_password = auth_service.get_password_hash(test_user["password"])
+            hash_password = await auth_service.get_password_hash(test_user["password"])
             current_user = User(username=test_user["username"], email=test_user["email"], password=hash_password,
                                 confirmed=True, role="admin")
             session.add(current_user)
@@ -39,7 +55,7 @@ def init_models_wrap():
     asyncio.run(init_models())
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def client():
     # Dependency override
 
@@ -50,6 +66,7 @@ def client():
         except Exception as err:
             print(err)
             await session.rollback()
+            raise
         finally:
             await session.close()
 
@@ -58,7 +75,22 @@ def client():
     yield TestClient(app)
 
 
-@pytest_asyncio.fixture()
-async def get_token():
-    token = await auth_service.create_access_token(data={"sub": test_user["email"]})
-    return token
+@pytest.fixture(autouse=True)
+def mock_redis(monkeypatch):
+    # every cache lookup misses unless a test sets mock_redis.get.return_value
+    redis_mock = AsyncMock()
+    redis_mock.get.return_value = None
+    monkeypatch.setattr(auth_service, "cache", redis_mock)
+    return redis_mock
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    # users resolved by get_current_user are kept per token for the whole process
+    auth_service.token_cache.clear()
+
+
+@pytest.fixture(scope="session")
+def get_token():
+    # the token only names test_user's email, so it stays valid across the per-module reseeding
+    return asyncio.run(auth_service.create_access_token(data={"sub": test_user["email"]}))
@@ -56,6 +56,35 @@ async def test_login(client):
     assert "token_type" in data
 
 
+@pytest.mark.asyncio
+async def test_login_upgrades_bcrypt_hash(client):
+    async with TestingSessionLocal() as session:
+        current_user = await session.scalar(select(User).where(User.email == user_data.get("email")))
+        current_user.password = auth_service.pwd_context.handler("bcrypt").hash(user_data.get("password"))
+        await session.commit()
+
+    response = client.post("api/auth/login",
+                           data={"username": user_data.get("email"), "password": user_data.get("password")})
+    assert response.status_code == 200, response.text
+    async with TestingSessionLocal() as session:
+        current_user = await session.scalar(select(User).where(User.email == user_data.get("email")))
+        assert current_user.password.startswith("$argon2")
+
+
+def test_refresh_token(client):
+    response = client.post("api/auth/login",
+                           data={"username": user_data.get("email"), "password": user_data.get("password")})
+    assert response.status_code == 200, response.text
+    tokens = response.json()
+    response = client.get("api/auth/refresh_token",
+                          headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 200, response.text
+    assert "access_token" in response.json()
+    response = client.get("api/auth/refresh_token",
+                          headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert response.status_code == 401, response.text
+
+
 # def test_wrong_password_login(client):
 #     response = client.post("api/auth/login", data={"username": user_data.get("email"), "password": "password"})
 #     assert response.status_code == 401, response.text
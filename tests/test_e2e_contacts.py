@@ -1,89 +1,184 @@
-from unittest.mock import Mock, patch
+from datetime import date
 
 import pytest
 
 from src.schemas.contacts import ContactUpdateSchema
-from src.services.auth import auth_service
 
 
 def test_get_contacts(client, get_token):
-    with patch.object(auth_service, "cache") as redis_mock:
-        redis_mock.get.return_value = None
-        token = get_token
-        headers = {"Authorization": f"Bearer {token}"}
-        response = client.get("api/contacts", headers=headers)
-        assert response.status_code == 200, response.text
-        data = response.json()
-        assert len(data) == 0
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("api/contacts", headers=headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data) == 0
 
 
 def test_get_contact(client, get_token):
-    with patch.object(auth_service, "cache") as redis_mock:
-        redis_mock.get.return_value = None
-        token = get_token
-        headers = {"Authorization": f"Bearer {token}"}
-        response = client.get("api/contacts", headers=headers)
-        assert response.status_code == 200, response.text
-        data = response.json()
-        assert len(data) == 0
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("api/contacts", headers=headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data) == 0
 
 
 def test_create_contact(client, get_token, monkeypatch):
-    with patch.object(auth_service, 'cache') as redis_mock:
-        redis_mock.get.return_value = None
-        token = get_token
-        headers = {"Authorization": f"Bearer {token}"}
-        response = client.post("api/contacts", headers=headers, json={
-            "name": "John",
-            "lastname": "Doe",
-            "email": "john.doe@example.com",
-            "phone": "1234567",
-            "birthdate": "01.01.1990",
-            "others_info": "Some additional info",
-            "completed": True
-        })
-
-        assert response.status_code == 201, response.text
-        data = response.json()
-        assert "id" in data
-        assert data["name"] == "John"
-        assert data["lastname"] == "Doe"
-        assert data["email"] == "john.doe@example.com"
-        assert data["phone"] == "1234567"
-        assert data["birthdate"] == "01.01.1990"
-        assert data["others_info"] == "Some additional info"
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.post("api/contacts", headers=headers, json={
+        "name": "John",
+        "lastname": "Doe",
+        "email": "john.doe@example.com",
+        "phone": "1234567",
+        "birthdate": "01.01.1990",
+        "others_info": "Some additional info",
+        "completed": True
+    })
+
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert "id" in data
+    assert data["name"] == "John"
+    assert data["lastname"] == "Doe"
+    assert data["email"] == "john.doe@example.com"
+    assert data["phone"] == "1234567"
+    assert data["birthdate"] == "01.01.1990"
+    assert data["others_info"] == "Some additional info"
+
+
+def test_search_contacts(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("api/contacts", headers=headers,
+                          params={"query": "DOE"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["lastname"] == "Doe"
+    response = client.get("api/contacts", headers=headers,
+                          params={"query": "unknown"})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 0
+    response = client.get("api/contacts", headers=headers,
+                          params={"query": "%"})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 0
+    response = client.get("api/contacts", headers=headers,
+                          params={"query": "jo"})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 1
+    response = client.get("api/contacts", headers=headers,
+                          params={"query": "DO"})
+    assert response.status_code == 200, response.text
+    assert [c["lastname"] for c in response.json()] == ["Doe"]
+    response = client.get("api/contacts", headers=headers,
+                          params={"query": "oe"})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 0
+
+
+def test_get_upcoming_birthdays(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    birthdate = date.today().replace(year=2000).strftime("%d.%m.%Y")
+    response = client.post("api/contacts", headers=headers, json={
+        "name": "Mary",
+        "lastname": "Birthday",
+        "email": "mary.birthday@example.com",
+        "phone": "7654321",
+        "birthdate": birthdate,
+        "others_info": "Birthday is today",
+    })
+    assert response.status_code == 201, response.text
+    response = client.get("api/contacts/birthdays", headers=headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [c["birthdate"] for c in data if c["name"] == "Mary"] == [birthdate]
+
+
+def test_create_contacts_bulk(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    bodies = [{
+        "name": f"Bulk{i}",
+        "lastname": "Imported",
+        "email": f"bulk{i}@example.com",
+        "phone": "1234567",
+        "birthdate": "02.03.1991",
+        "others_info": "Imported contact",
+    } for i in range(10)]
+    response = client.post("api/contacts/bulk", headers=headers, json=bodies)
+    assert response.status_code == 201, response.text
+    ids = response.json()
+    assert len(ids) == 10
+    response = client.get("api/contacts", headers=headers | {"Origin": "http://example.com"},
+                          params={"query": "imported", "limit": 10})
+    assert response.status_code == 200, response.text
+    assert [c["id"] for c in response.json()] == sorted(ids)
+    assert response.headers["X-Next-Cursor"] == str(max(ids))
+    assert "X-Next-Cursor" in response.headers["Access-Control-Expose-Headers"]
+    response = client.get("api/contacts", headers=headers,
+                          params={"query": "imported", "after_id": ids[4]})
+    assert response.status_code == 200, response.text
+    assert [c["id"] for c in response.json()] == sorted(ids)[5:]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_create_contacts_bulk_limit(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {
+        "name": "Over",
+        "lastname": "Limit",
+        "email": "over.limit@example.com",
+        "phone": "1234567",
+        "birthdate": "02.03.1991",
+        "others_info": "Imported contact",
+    }
+    response = client.post("api/contacts/bulk", headers=headers, json=[body] * 1001)
+    assert response.status_code == 422, response.text
+    errors = response.json()["detail"]
+    assert [(e["type"], e["loc"]) for e in errors] == [("too_long", ["body"])]
+    response = client.post("api/contacts/bulk", headers=headers, json=[body] * 1000)
+    assert response.status_code == 201, response.text
+    assert len(response.json()) == 1000
 
 
 def test_update_contact(client, get_token):
-    with patch.object(auth_service, "cache") as redis_mock:
-        redis_mock.get.return_value = None
-        token = get_token
-        headers = {"Authorization": f"Bearer {token}"}
-        response = client.put("api/contacts/1", headers=headers, json={
-            "name": "NIKO",
-            "lastname": "ARMANY",
-            "email": "new_ARMANY@example.com",
-            "phone": "123456789",
-            "birthdate": "01.01.1990",
-            "others_info": "is None",
-            "completed": False
-        })
-        assert response.status_code == 200, response.text
-        data = response.json()
-        assert "id" in data
-        assert data["name"] == "NIKO"
-        assert data["lastname"] == "ARMANY"
-        assert data["email"] == "new_ARMANY@example.com"
-        assert data["phone"] == "123456789"
-        assert data["birthdate"] == "01.01.1990"
-        assert data["others_info"] == "is None"
-        assert data["completed"] is False
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.put("api/contacts/1", headers=headers, json={
+        "name": "NIKO",
+        "lastname": "ARMANY",
+        "email": "new_ARMANY@example.com",
+        "phone": "123456789",
+        "birthdate": "01.01.1990",
+        "others_info": "is None",
+        "completed": False
+    })
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert "id" in data
+    assert data["name"] == "NIKO"
+    assert data["lastname"] == "ARMANY"
+    assert data["email"] == "new_ARMANY@example.com"
+    assert data["phone"] == "123456789"
+    assert data["birthdate"] == "01.01.1990"
+    assert data["others_info"] == "is None"
+    assert data["completed"] is False
 
 
 def test_delete_contact(client, get_token):
-    with patch.object(auth_service, "cache") as redis_mock:
-        redis_mock.get.return_value = None
-        token = get_token
-        headers = {"Authorization": f"Bearer {token}"}
-        response = client.delete("api/contacts/1", headers=headers)
-        assert response.status_code == 204
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.delete("api/contacts/1", headers=headers)
+    assert response.status_code == 204
+
+
+def test_delete_missing_contact(client, get_token):
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.delete("api/contacts/1", headers=headers)
+    assert response.status_code == 404, response.text
+    assert response.json()["detail"] == "Contact not found"
@@ -1,20 +1,49 @@
-from unittest.mock import Mock, patch, AsyncMock
+from unittest.mock import AsyncMock
 
 import pytest
 
+from src.entity.models import Role
 from src.schemas.contacts import ContactUpdateSchema
-from src.services.auth import auth_service
+from src.services.auth import CachedUser
+from tests.conftest import test_user
 
 
 def test_get_me(client, get_token, monkeypatch):
-    with patch.object(auth_service, "cache") as redis_mock:
-        redis_mock.get.return_value = None
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.identifier", AsyncMock())
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.http_callback", AsyncMock())
-        token = get_token
-        headers = {"Authorization": f"Bearer {token}"}
-        response = client.get("api/users/me", headers=headers)
-        assert response.status_code == 200, response.text
-        data = response.json()
-        assert len(data) == 5
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.identifier", AsyncMock())
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.http_callback", AsyncMock())
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("api/users/me", headers=headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data) == 5
+
+
+def test_get_me_from_cache(client, get_token, mock_redis, monkeypatch):
+    mock_redis.get.return_value = CachedUser(
+        id=1, username="cached", email=test_user["email"], role=Role.admin,
+        confirmed=True, avatar=None).pack()
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.identifier", AsyncMock())
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.http_callback", AsyncMock())
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("api/users/me", headers=headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["username"] == "cached"
+    assert data["role"] == "admin"
+
+
+def test_get_me_from_bad_cache(client, get_token, mock_redis, monkeypatch):
+    mock_redis.get.return_value = b"\x80\x03not msgpack"
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.identifier", AsyncMock())
+    monkeypatch.setattr("fastapi_limiter.FastAPILimiter.http_callback", AsyncMock())
+    token = get_token
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("api/users/me", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["username"] == test_user["username"]
+    mock_redis.set.assert_awaited_once()
@@ -57,7 +57,7 @@ class TestAsyncContact(unittest.IsolatedAsyncioTestCase):
             lastname='test_description',
             email='test_email@test.com',
             phone='1234567890',
-            birthdate='test_birthdate',
+            birthdate='01.01.1990',
             others_info='test_others_info',
             completed=True
         )